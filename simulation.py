@@ -1,10 +1,13 @@
 import numpy as np
+import orjson
 import pygame
-import json
+from numba import njit, prange
+import math
+import random
 import time
 import sys
 import traceback
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
 from dataclasses import dataclass
 from enum import Enum
 
@@ -14,110 +17,518 @@ class ObjectType(Enum):
     RED_BLOCK = "red_block"
     BLUE_BLOCK = "blue_block"
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Vector2D:
     x: float
     y: float
     
     def normalize(self) -> 'Vector2D':
-        try:
-            length = np.sqrt(self.x**2 + self.y**2)
-            if length == 0:
-                return Vector2D(0, 0)
-            return Vector2D(self.x / length, self.y / length)
-        except Exception as e:
-            print(f"Error normalizing vector: {e}")
+        length = math.hypot(self.x, self.y)
+        if length == 0:
             return Vector2D(0, 0)
+        return Vector2D(self.x / length, self.y / length)
     
     def __add__(self, other: 'Vector2D') -> 'Vector2D':
-        try:
-            return Vector2D(self.x + other.x, self.y + other.y)
-        except Exception as e:
-            print(f"Error adding vectors: {e}")
-            return Vector2D(0, 0)
+        return Vector2D(self.x + other.x, self.y + other.y)
     
     def __sub__(self, other: 'Vector2D') -> 'Vector2D':
-        try:
-            return Vector2D(self.x - other.x, self.y - other.y)
-        except Exception as e:
-            print(f"Error subtracting vectors: {e}")
-            return Vector2D(0, 0)
+        return Vector2D(self.x - other.x, self.y - other.y)
     
     def __mul__(self, scalar: float) -> 'Vector2D':
-        try:
-            return Vector2D(self.x * scalar, self.y * scalar)
-        except Exception as e:
-            print(f"Error multiplying vector by scalar: {e}")
-            return Vector2D(0, 0)
+        return Vector2D(self.x * scalar, self.y * scalar)
+
+_OBJECT_TYPES = tuple(ObjectType)
+_TYPE_IDS = {obj_type: type_id for type_id, obj_type in enumerate(_OBJECT_TYPES)}
+_TYPE_NAMES = tuple(obj_type.value for obj_type in _OBJECT_TYPES)
+TYPE_WALL = _TYPE_IDS[ObjectType.WALL]
+TYPE_CENTER = _TYPE_IDS[ObjectType.CENTER_BLOCK]
+TYPE_RED = _TYPE_IDS[ObjectType.RED_BLOCK]
+TYPE_BLUE = _TYPE_IDS[ObjectType.BLUE_BLOCK]
+
+SPATIAL_HASH_THRESHOLD = 32
+QUADTREE_MAX_ITEMS = 4
+QUADTREE_MAX_DEPTH = 8
+
+DIRTY_RECT_MAX_FRACTION = 0.25
+
+MAX_EVENTS_PER_OBJECT = 4
+_NO_HIT = 1e30
+_CONTACT_TOLERANCE = 1e-9
+
+SCRATCH_ALIGNMENT = 64
+STATE_DTYPE = np.float32
+
+ObjectSpec = Tuple[ObjectType, Vector2D, Vector2D, int, Tuple[int, int, int], bool]
+
+def _aligned_empty(shape: Tuple[int, ...], dtype=STATE_DTYPE, alignment: int = SCRATCH_ALIGNMENT) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    raw = np.empty(nbytes + alignment, dtype=np.uint8)
+    offset = -raw.ctypes.data % alignment
+    return raw[offset:offset + nbytes].view(dtype).reshape(shape)
 
-@dataclass
 class GameObject:
-    obj_type: ObjectType
-    position: Vector2D
-    velocity: Vector2D
-    size: int
-    color: Tuple[int, int, int]
-    is_static: bool = False
-    
-    def get_bounds(self) -> Tuple[int, int, int, int]:
-        try:
-            half_size = self.size // 2
-            return (
-                int(self.position.x - half_size),
-                int(self.position.y - half_size),
-                int(self.position.x + half_size),
-                int(self.position.y + half_size)
-            )
-        except Exception as e:
-            print(f"Error calculating bounds: {e}")
-            return (0, 0, 0, 0)
+    def __init__(self, engine: 'PhysicsEngine', index: int):
+        self.engine = engine
+        self.index = index
+        self._bounds: Optional[Tuple[float, float, float, float]] = None
+    
+    @property
+    def obj_type(self) -> ObjectType:
+        return _OBJECT_TYPES[self.engine.obj_type[self.index]]
+    
+    @property
+    def size(self) -> int:
+        return int(self.engine.sizes[self.index])
+    
+    @property
+    def color(self) -> Tuple[int, int, int]:
+        return self.engine.colors[self.index]
+    
+    @property
+    def position(self) -> np.ndarray:
+        return self.engine.pos[self.index]
+    
+    @property
+    def velocity(self) -> np.ndarray:
+        return self.engine.vel[self.index]
+    
+    @property
+    def is_static(self) -> bool:
+        return bool(self.engine.is_static[self.index])
+    
+    def get_bounds(self) -> Tuple[float, float, float, float]:
+        if self._bounds is not None:
+            return self._bounds
+        half_size = self.size // 2
+        x, y = self.position.tolist()
+        return (x - half_size, y - half_size, x + half_size, y + half_size)
     
     def check_collision(self, other: 'GameObject') -> bool:
-        try:
-            bounds1 = self.get_bounds()
-            bounds2 = other.get_bounds()
-            return not (bounds1[2] < bounds2[0] or bounds1[0] > bounds2[2] or
-                        bounds1[3] < bounds2[1] or bounds1[1] > bounds2[3])
-        except Exception as e:
-            print(f"Error checking collision: {e}")
-            return False
+        bounds1 = self.get_bounds()
+        bounds2 = other.get_bounds()
+        return not (bounds1[2] < bounds2[0] or bounds1[0] > bounds2[2] or
+                    bounds1[3] < bounds2[1] or bounds1[1] > bounds2[3])
+
+class SpatialHashGrid:
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.static_cells: Dict[int, List[int]] = {}
+        self.cells: Dict[int, List[int]] = {}
+    
+    def _keys(self, mins: List[float], maxs: List[float]) -> List[int]:
+        cell_size = self.cell_size
+        x0, y0 = int(mins[0] // cell_size), int(mins[1] // cell_size)
+        x1, y1 = int(maxs[0] // cell_size), int(maxs[1] // cell_size)
+        return [(cx * 73856093) ^ (cy * 19349663) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+    
+    def insert_static(self, mins: np.ndarray, maxs: np.ndarray, is_static: np.ndarray):
+        self.static_cells.clear()
+        mins_list, maxs_list = mins.tolist(), maxs.tolist()
+        for i in np.flatnonzero(is_static).tolist():
+            for key in self._keys(mins_list[i], maxs_list[i]):
+                self.static_cells.setdefault(key, []).append(i)
+    
+    def candidate_pairs(self, mins: np.ndarray, maxs: np.ndarray, is_static: np.ndarray) -> np.ndarray:
+        cells, static_cells = self.cells, self.static_cells
+        for bucket in cells.values():
+            bucket.clear()
+        mins_list, maxs_list = mins.tolist(), maxs.tolist()
+        mobile_keys = {}
+        for i in np.flatnonzero(~is_static).tolist():
+            keys = self._keys(mins_list[i], maxs_list[i])
+            mobile_keys[i] = keys
+            for key in keys:
+                bucket = cells.get(key)
+                if bucket is None:
+                    bucket = cells[key] = []
+                bucket.append(i)
+        pairs = []
+        for i, keys in mobile_keys.items():
+            (ax0, ay0), (ax1, ay1) = mins_list[i], maxs_list[i]
+            seen = {i}
+            for key in keys:
+                for bucket in (static_cells.get(key, ()), cells[key]):
+                    for j in bucket:
+                        if j in seen or (j < i and j in mobile_keys):
+                            continue
+                        seen.add(j)
+                        (bx0, by0), (bx1, by1) = mins_list[j], maxs_list[j]
+                        if not (ax0 > bx1 or ax1 < bx0 or ay0 > by1 or ay1 < by0):
+                            pairs.append((i, j))
+        pairs.sort()
+        return np.array(pairs, dtype=np.intp).reshape(-1, 2)
+
+class QuadTree:
+    def __init__(self, max_items: int = QUADTREE_MAX_ITEMS, max_depth: int = QUADTREE_MAX_DEPTH):
+        self.max_items = max_items
+        self.max_depth = max_depth
+        self.build([], [], [])
+    
+    def build(self, indices: List[int], mins: List[List[float]], maxs: List[List[float]]):
+        self.mins, self.maxs = mins, maxs
+        if indices:
+            bounds = (min(mins[i][0] for i in indices), min(mins[i][1] for i in indices),
+                      max(maxs[i][0] for i in indices), max(maxs[i][1] for i in indices))
+        else:
+            bounds = (0.0, 0.0, 0.0, 0.0)
+        self.node_bounds = [bounds]
+        self.children = [-1]
+        self.depth = [0]
+        self.items: List[List[int]] = [[]]
+        for i in indices:
+            self.insert(i)
+    
+    def _quadrant(self, node: int, idx: int) -> int:
+        x0, y0, x1, y1 = self.node_bounds[node]
+        cx, cy = (x0 + x1) * 0.5, (y0 + y1) * 0.5
+        (ax0, ay0), (ax1, ay1) = self.mins[idx], self.maxs[idx]
+        if ax1 <= cx:
+            qx = 0
+        elif ax0 >= cx:
+            qx = 1
+        else:
+            return -1
+        if ay1 <= cy:
+            return qx
+        if ay0 >= cy:
+            return qx + 2
+        return -1
+    
+    def insert(self, idx: int):
+        node = 0
+        while self.children[node] >= 0:
+            quadrant = self._quadrant(node, idx)
+            if quadrant < 0:
+                break
+            node = self.children[node] + quadrant
+        items = self.items[node]
+        items.append(idx)
+        if self.children[node] < 0 and len(items) > self.max_items and self.depth[node] < self.max_depth:
+            self._split(node)
+    
+    def _split(self, node: int):
+        x0, y0, x1, y1 = self.node_bounds[node]
+        cx, cy = (x0 + x1) * 0.5, (y0 + y1) * 0.5
+        first = len(self.node_bounds)
+        self.children[node] = first
+        self.node_bounds += [(x0, y0, cx, cy), (cx, y0, x1, cy), (x0, cy, cx, y1), (cx, cy, x1, y1)]
+        self.children += [-1] * 4
+        self.depth += [self.depth[node] + 1] * 4
+        self.items += [[], [], [], []]
+        items, self.items[node] = self.items[node], []
+        for idx in items:
+            quadrant = self._quadrant(node, idx)
+            self.items[node if quadrant < 0 else first + quadrant].append(idx)
+    
+    def query(self, mins: List[float], maxs: List[float]) -> List[int]:
+        node_bounds, children, items = self.node_bounds, self.children, self.items
+        item_mins, item_maxs = self.mins, self.maxs
+        (ax0, ay0), (ax1, ay1) = mins, maxs
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            x0, y0, x1, y1 = node_bounds[node]
+            if ax0 > x1 or ax1 < x0 or ay0 > y1 or ay1 < y0:
+                continue
+            for j in items[node]:
+                (bx0, by0), (bx1, by1) = item_mins[j], item_maxs[j]
+                if not (ax0 > bx1 or ax1 < bx0 or ay0 > by1 or ay1 < by0):
+                    found.append(j)
+            first = children[node]
+            if first >= 0:
+                stack += (first, first + 1, first + 2, first + 3)
+        return found
+
+class QuadTreeBroadPhase:
+    def __init__(self):
+        self.static_tree = QuadTree()
+        self.mobile_tree = QuadTree()
+    
+    def insert_static(self, mins: np.ndarray, maxs: np.ndarray, is_static: np.ndarray):
+        self.static_tree.build(np.flatnonzero(is_static).tolist(), mins.tolist(), maxs.tolist())
+    
+    def candidate_pairs(self, mins: np.ndarray, maxs: np.ndarray, is_static: np.ndarray) -> np.ndarray:
+        mins_list, maxs_list = mins.tolist(), maxs.tolist()
+        mobile = np.flatnonzero(~is_static).tolist()
+        self.mobile_tree.build(mobile, mins_list, maxs_list)
+        pairs = []
+        for i in mobile:
+            box_min, box_max = mins_list[i], maxs_list[i]
+            pairs += [(i, j) for j in self.static_tree.query(box_min, box_max)]
+            pairs += [(i, j) for j in self.mobile_tree.query(box_min, box_max) if j > i]
+        pairs.sort()
+        return np.array(pairs, dtype=np.intp).reshape(-1, 2)
+
+@njit(cache=True, fastmath=True)
+def _integrate_positions(pos, vel, mobile_idx, dt):
+    for i in mobile_idx:
+        pos[i, 0] += vel[i, 0] * dt
+        pos[i, 1] += vel[i, 1] * dt
+
+@njit(cache=True, fastmath=True)
+def _sweep_axis(amin, amax, bmin, bmax, v):
+    if v > 0.0:
+        return (bmin - amax) / v, (bmax - amin) / v
+    if v < 0.0:
+        return (bmax - amin) / v, (bmin - amax) / v
+    if amax <= bmin or amin >= bmax:
+        return _NO_HIT, -_NO_HIT
+    return -_NO_HIT, _NO_HIT
+
+@njit(cache=True, fastmath=True)
+def _time_of_impact(ax, ay, ha, bmin_x, bmax_x, bmin_y, bmax_y, vx, vy):
+    enter_x, exit_x = _sweep_axis(ax - ha, ax + ha, bmin_x, bmax_x, vx)
+    enter_y, exit_y = _sweep_axis(ay - ha, ay + ha, bmin_y, bmax_y, vy)
+    if enter_x > enter_y:
+        enter, axis = enter_x, 0
+    else:
+        enter, axis = enter_y, 1
+    exit = min(exit_x, exit_y)
+    if enter < exit:
+        if enter > -_CONTACT_TOLERANCE:
+            return max(enter, 0.0), axis
+        if exit > 0.0:
+            depth_x = min(ax + ha, bmax_x) - max(ax - ha, bmin_x)
+            depth_y = min(ay + ha, bmax_y) - max(ay - ha, bmin_y)
+            if depth_x < depth_y:
+                if ((bmin_x + bmax_x) * 0.5 - ax) * vx > 0.0:
+                    return 0.0, 0
+            elif ((bmin_y + bmax_y) * 0.5 - ay) * vy > 0.0:
+                return 0.0, 1
+    return _NO_HIT, -1
+
+@njit(cache=True, fastmath=True)
+def _edge_time(p, v, lo, hi):
+    if v > 0.0:
+        return max((hi - p) / v, 0.0)
+    if v < 0.0:
+        return max((lo - p) / v, 0.0)
+    return _NO_HIT
+
+@njit(cache=True, fastmath=True)
+def _bounce(vel, is_static, i, j, axis):
+    vel[i, axis] = -vel[i, axis]
+    if j >= 0 and not is_static[j]:
+        vel[j, axis] = -vel[j, axis]
+
+@njit(cache=True, fastmath=True)
+def _sweep_pairs(pos, vel, half, is_static, static_mins, static_maxs, mobile_idx, pairs, grid_size):
+    remaining = 1.0
+    for _ in range(MAX_EVENTS_PER_OBJECT * mobile_idx.shape[0]):
+        t_hit, i_hit, j_hit, axis_hit = remaining, -1, -1, -1
+        for k in range(pairs.shape[0]):
+            i, j = pairs[k, 0], pairs[k, 1]
+            if is_static[j]:
+                t, axis = _time_of_impact(pos[i, 0], pos[i, 1], half[i],
+                                          static_mins[j, 0], static_maxs[j, 0], static_mins[j, 1], static_maxs[j, 1],
+                                          vel[i, 0], vel[i, 1])
+            else:
+                t, axis = _time_of_impact(pos[i, 0], pos[i, 1], half[i],
+                                          pos[j, 0] - half[j], pos[j, 0] + half[j], pos[j, 1] - half[j], pos[j, 1] + half[j],
+                                          vel[i, 0] - vel[j, 0], vel[i, 1] - vel[j, 1])
+            if t < t_hit:
+                t_hit, i_hit, j_hit, axis_hit = t, i, j, axis
+        for i in mobile_idx:
+            for axis in range(2):
+                t = _edge_time(pos[i, axis], vel[i, axis], half[i], grid_size - half[i])
+                if t < t_hit:
+                    t_hit, i_hit, j_hit, axis_hit = t, i, -1, axis
+        _integrate_positions(pos, vel, mobile_idx, t_hit)
+        remaining -= t_hit
+        if i_hit < 0:
+            return
+        _bounce(vel, is_static, i_hit, j_hit, axis_hit)
+    _integrate_positions(pos, vel, mobile_idx, remaining)
+
+@njit(cache=True, fastmath=True)
+def _enforce_boundaries(pos, vel, half, mobile_idx, grid_size):
+    for i in mobile_idx:
+        lo = half[i]
+        hi = grid_size - lo
+        for axis in range(2):
+            p, v = pos[i, axis], vel[i, axis]
+            below, above = p < lo, p > hi
+            pos[i, axis] = min(max(p, lo), hi)
+            vel[i, axis] = v + (abs(v) - v) * below - (abs(v) + v) * above
+
+@njit(cache=True)
+def _find_root(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+@njit(cache=True)
+def _partition_islands(pairs, mobile_idx, is_static):
+    n = is_static.shape[0]
+    parent = np.arange(n)
+    for k in range(pairs.shape[0]):
+        i, j = pairs[k, 0], pairs[k, 1]
+        if not is_static[j]:
+            ri, rj = _find_root(parent, i), _find_root(parent, j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+    island_of = np.full(n, -1, dtype=np.intp)
+    n_islands = 0
+    for i in mobile_idx:
+        root = _find_root(parent, i)
+        if island_of[root] < 0:
+            island_of[root] = n_islands
+            n_islands += 1
+        island_of[i] = island_of[root]
+    mobile_offsets = np.zeros(n_islands + 1, dtype=np.intp)
+    pair_offsets = np.zeros(n_islands + 1, dtype=np.intp)
+    for i in mobile_idx:
+        mobile_offsets[island_of[i] + 1] += 1
+    for k in range(pairs.shape[0]):
+        pair_offsets[island_of[pairs[k, 0]] + 1] += 1
+    mobile_offsets = np.cumsum(mobile_offsets)
+    pair_offsets = np.cumsum(pair_offsets)
+    island_mobiles = np.empty(mobile_idx.shape[0], dtype=np.intp)
+    island_pairs = np.empty_like(pairs)
+    fill = mobile_offsets[:-1].copy()
+    for i in mobile_idx:
+        island_mobiles[fill[island_of[i]]] = i
+        fill[island_of[i]] += 1
+    fill = pair_offsets[:-1].copy()
+    for k in range(pairs.shape[0]):
+        slot = fill[island_of[pairs[k, 0]]]
+        island_pairs[slot, 0], island_pairs[slot, 1] = pairs[k, 0], pairs[k, 1]
+        fill[island_of[pairs[k, 0]]] += 1
+    return island_mobiles, mobile_offsets, island_pairs, pair_offsets
+
+@njit(cache=True, fastmath=True, parallel=True, nogil=True)
+def _sweep_islands(pos, vel, half, is_static, static_mins, static_maxs, mobile_idx, pairs, grid_size):
+    island_mobiles, mobile_offsets, island_pairs, pair_offsets = _partition_islands(pairs, mobile_idx, is_static)
+    for k in prange(mobile_offsets.shape[0] - 1):
+        _sweep_pairs(pos, vel, half, is_static, static_mins, static_maxs,
+                     island_mobiles[mobile_offsets[k]:mobile_offsets[k + 1]],
+                     island_pairs[pair_offsets[k]:pair_offsets[k + 1]], grid_size)
+
+@njit(cache=True, fastmath=True, nogil=True)
+def step(hot, half, is_static, static_mins, static_maxs, mobile_idx, pairs, grid_size):
+    pos, vel = hot[:, 0:2], hot[:, 2:4]
+    _sweep_pairs(pos, vel, half, is_static, static_mins, static_maxs, mobile_idx, pairs, grid_size)
+    _enforce_boundaries(pos, vel, half, mobile_idx, grid_size)
+
+@njit(cache=True, fastmath=True, nogil=True)
+def run_steps(hot, half, is_static, static_mins, static_maxs, mobile_idx, pairs, grid_size, record_idx, traj):
+    for s in range(traj.shape[0]):
+        step(hot, half, is_static, static_mins, static_maxs, mobile_idx, pairs, grid_size)
+        for k in range(record_idx.shape[0]):
+            traj[s, k, 0] = hot[record_idx[k], 0]
+            traj[s, k, 1] = hot[record_idx[k], 1]
 
 class PhysicsEngine:
-    def __init__(self, grid_size: int = 1000):
+    def __init__(self, grid_size: int = 1000, seed: Optional[int] = None, broad_phase: str = "hash"):
+        if broad_phase not in ("hash", "quadtree"):
+            raise ValueError(f"Unknown broad phase: {broad_phase}")
         self.grid_size = grid_size
-        self.objects: List[GameObject] = []
+        self.broad_phase = broad_phase
+        self._rng = random.Random(seed)
         self.time_step = 0
         self.error_count = 0
         self.max_errors = 10
+        self._allocate(0)
+    
+    def _allocate(self, count: int):
+        self.objects: List[GameObject] = []
+        self._broad_phase: Optional[Union[SpatialHashGrid, QuadTreeBroadPhase]] = None
+        self._hot = np.zeros((count, 4), dtype=STATE_DTYPE)
+        self.pos = self._hot[:, 0:2]
+        self.vel = self._hot[:, 2:4]
+        self.half_size = np.zeros(count, dtype=STATE_DTYPE)
+        self.sizes = np.zeros(count, dtype=np.int64)
+        self.colors: List[Tuple[int, int, int]] = []
+        self.static_mins = np.zeros((count, 2), dtype=STATE_DTYPE)
+        self.static_maxs = np.zeros((count, 2), dtype=STATE_DTYPE)
+        self._scratch_mins = _aligned_empty((count, 2))
+        self._scratch_maxs = _aligned_empty((count, 2))
+        self._scratch_reach = _aligned_empty((count, 2))
+        self.mobile_idx = np.zeros(0, dtype=np.intp)
+        self.static_idx = np.zeros(0, dtype=np.intp)
+        self.mobile_objs: List[GameObject] = []
+        self.static_objs: List[GameObject] = []
+        self.collision_pairs = np.zeros((0, 2), dtype=np.intp)
+        self.is_static = np.zeros(count, dtype=bool)
+        self.obj_type = np.zeros(count, dtype=np.int8)
+    
+    def _add_object(self, obj_type: ObjectType, position: Vector2D, velocity: Vector2D, size: int, color: Tuple[int, int, int], is_static: bool = False) -> GameObject:
+        index = len(self.objects)
+        self.pos[index] = (position.x, position.y)
+        self.vel[index] = (velocity.x, velocity.y)
+        self.half_size[index] = size // 2
+        self.sizes[index] = size
+        self.colors.append(color)
+        self.is_static[index] = is_static
+        self.obj_type[index] = _TYPE_IDS[obj_type]
+        obj = GameObject(self, index)
+        if is_static:
+            obj._bounds = obj.get_bounds()
+        self.objects.append(obj)
+        return obj
     
     def initialize_simulation(self):
         try:
-            self.objects.clear()
             wall_thickness = 20
             wall_color = (0, 255, 0)
-            self.objects.append(GameObject(ObjectType.WALL, Vector2D(self.grid_size // 2, wall_thickness // 2), Vector2D(0, 0), wall_thickness, wall_color, True))
-            self.objects.append(GameObject(ObjectType.WALL, Vector2D(self.grid_size // 2, self.grid_size - wall_thickness // 2), Vector2D(0, 0), wall_thickness, wall_color, True))
-            self.objects.append(GameObject(ObjectType.WALL, Vector2D(wall_thickness // 2, self.grid_size // 2), Vector2D(0, 0), wall_thickness, wall_color, True))
-            self.objects.append(GameObject(ObjectType.WALL, Vector2D(self.grid_size - wall_thickness // 2, self.grid_size // 2), Vector2D(0, 0), wall_thickness, wall_color, True))
-            self.objects.append(GameObject(ObjectType.CENTER_BLOCK, Vector2D(self.grid_size // 2, self.grid_size // 2), Vector2D(0, 0), 50, (0, 255, 0), True))
+            specs = [
+                (ObjectType.WALL, Vector2D(self.grid_size // 2, wall_thickness // 2), Vector2D(0, 0), wall_thickness, wall_color, True),
+                (ObjectType.WALL, Vector2D(self.grid_size // 2, self.grid_size - wall_thickness // 2), Vector2D(0, 0), wall_thickness, wall_color, True),
+                (ObjectType.WALL, Vector2D(wall_thickness // 2, self.grid_size // 2), Vector2D(0, 0), wall_thickness, wall_color, True),
+                (ObjectType.WALL, Vector2D(self.grid_size - wall_thickness // 2, self.grid_size // 2), Vector2D(0, 0), wall_thickness, wall_color, True),
+                (ObjectType.CENTER_BLOCK, Vector2D(self.grid_size // 2, self.grid_size // 2), Vector2D(0, 0), 50, (0, 255, 0), True),
+            ]
             red_start_pos = Vector2D(100, 100)
             red_velocity = self._get_random_velocity()
-            self.objects.append(GameObject(ObjectType.RED_BLOCK, red_start_pos, red_velocity, 30, (255, 0, 0), False))
+            specs.append((ObjectType.RED_BLOCK, red_start_pos, red_velocity, 30, (255, 0, 0), False))
             blue_start_pos = Vector2D(900, 900)
             blue_velocity = self._get_random_velocity()
-            self.objects.append(GameObject(ObjectType.BLUE_BLOCK, blue_start_pos, blue_velocity, 30, (0, 0, 255), False))
-            self.time_step = 0
-            self.error_count = 0
+            specs.append((ObjectType.BLUE_BLOCK, blue_start_pos, blue_velocity, 30, (0, 0, 255), False))
+            self.load_objects(specs)
+            self._warm_up()
             print("Simulation initialized successfully")
         except Exception as e:
             print(f"Error initializing simulation: {e}")
             traceback.print_exc()
             raise
     
+    def load_objects(self, specs: List[ObjectSpec]):
+        self._allocate(len(specs))
+        for spec in specs:
+            self._add_object(*spec)
+        self.static_mins, self.static_maxs = self._aabbs()
+        self.mobile_idx = np.flatnonzero(~self.is_static)
+        self.static_idx = np.flatnonzero(self.is_static)
+        self.mobile_objs = [self.objects[i] for i in self.mobile_idx]
+        self.static_objs = [self.objects[i] for i in self.static_idx]
+        if self.broad_phase == "hash" and len(self.objects) < SPATIAL_HASH_THRESHOLD:
+            mobile, static = self.mobile_idx.tolist(), self.static_idx.tolist()
+            pairs = [(i, j) for k, i in enumerate(mobile) for j in static + mobile[k + 1:]]
+            self.collision_pairs = np.array(pairs, dtype=np.intp).reshape(-1, 2)
+        else:
+            if self.broad_phase == "quadtree":
+                self._broad_phase = QuadTreeBroadPhase()
+            else:
+                cell_size = max(32.0, 2 * np.mean(2 * self.half_size))
+                self._broad_phase = SpatialHashGrid(cell_size)
+            self._broad_phase.insert_static(self.static_mins, self.static_maxs, self.is_static)
+        self.time_step = 0
+        self.error_count = 0
+    
+    def _warm_up(self):
+        step(self._hot.copy(), self.half_size, self.is_static, self.static_mins, self.static_maxs,
+             self.mobile_idx, self.collision_pairs, self.grid_size)
+        run_steps(self._hot.copy(), self.half_size, self.is_static, self.static_mins, self.static_maxs,
+                  self.mobile_idx, self.collision_pairs, self.grid_size,
+                  np.zeros(0, dtype=np.intp), np.zeros((1, 0, 2), dtype=STATE_DTYPE))
+    
     def _get_random_velocity(self) -> Vector2D:
         try:
-            angle = np.random.uniform(0, 2 * np.pi)
-            return Vector2D(np.cos(angle), np.sin(angle))
+            angle = self._rng.uniform(0, math.tau)
+            return Vector2D(math.cos(angle), math.sin(angle))
         except Exception as e:
             print(f"Error generating random velocity: {e}")
             return Vector2D(1, 0)
@@ -125,134 +536,176 @@ class PhysicsEngine:
     def update(self):
         try:
             self.time_step += 1
-            for obj in self.objects:
-                if not obj.is_static:
-                    obj.position = obj.position + obj.velocity
-            self._handle_collisions()
-            self._enforce_boundaries()
+            if self._broad_phase is None:
+                step(self._hot, self.half_size, self.is_static, self.static_mins, self.static_maxs,
+                     self.mobile_idx, self.collision_pairs, self.grid_size)
+            else:
+                _sweep_islands(self.pos, self.vel, self.half_size, self.is_static, self.static_mins, self.static_maxs,
+                               self.mobile_idx, self.find_collision_pairs(), self.grid_size)
+                _enforce_boundaries(self.pos, self.vel, self.half_size, self.mobile_idx, self.grid_size)
         except Exception as e:
-            self.error_count += 1
-            print(f"Error in physics update (step {self.time_step}): {e}")
-            if self.error_count >= self.max_errors:
-                print("Too many errors, stopping simulation")
-                raise
+            self._handle_step_error(e)
     
-    def _handle_collisions(self):
-        try:
-            for i, obj1 in enumerate(self.objects):
-                if obj1.is_static:
-                    continue
-                for j, obj2 in enumerate(self.objects):
-                    if i == j:
-                        continue
-                    if obj1.check_collision(obj2):
-                        self._resolve_collision(obj1, obj2)
-        except Exception as e:
-            print(f"Error handling collisions: {e}")
+    def _handle_step_error(self, e: Exception):
+        self.error_count += 1
+        print(f"Error in physics update (step {self.time_step}): {e}")
+        if self.error_count >= self.max_errors:
+            print("Too many errors, stopping simulation")
+            raise
     
-    def _resolve_collision(self, obj1: GameObject, obj2: GameObject):
-        try:
-            if obj2.is_static:
-                self._bounce_off_static(obj1, obj2)
-            else:
-                self._bounce_off_mobile(obj1, obj2)
-        except Exception as e:
-            print(f"Error resolving collision: {e}")
+    def run(self, n_steps: int, record: Optional[Union[List[int], Tuple[int, ...], np.ndarray]] = None) -> np.ndarray:
+        idx = np.asarray([] if record is None else record, dtype=np.intp)
+        record_idx = np.arange(len(self.objects))[idx]
+        traj = np.zeros((n_steps, len(record_idx), 2), dtype=STATE_DTYPE)
+        if self._broad_phase is None:
+            try:
+                self.time_step += n_steps
+                run_steps(self._hot, self.half_size, self.is_static, self.static_mins, self.static_maxs,
+                          self.mobile_idx, self.collision_pairs, self.grid_size, record_idx, traj)
+            except Exception as e:
+                self._handle_step_error(e)
+        else:
+            for s in range(n_steps):
+                self.update()
+                traj[s] = self.pos[record_idx]
+        return traj
     
-    def _bounce_off_static(self, mobile_obj: GameObject, static_obj: GameObject):
-        try:
-            normal = mobile_obj.position - static_obj.position
-            normal = normal.normalize()
-            dot_product = mobile_obj.velocity.x * normal.x + mobile_obj.velocity.y * normal.y
-            reflected_velocity = Vector2D(
-                mobile_obj.velocity.x - 2 * dot_product * normal.x,
-                mobile_obj.velocity.y - 2 * dot_product * normal.y
-            )
-            mobile_obj.velocity = reflected_velocity
-            mobile_obj.position = mobile_obj.position + normal * 2
-        except Exception as e:
-            print(f"Error bouncing off static object: {e}")
+    def _aabbs(self) -> Tuple[np.ndarray, np.ndarray]:
+        half = self.half_size[:, None]
+        return self.pos - half, self.pos + half
     
-    def _bounce_off_mobile(self, obj1: GameObject, obj2: GameObject):
-        try:
-            normal = obj1.position - obj2.position
-            normal = normal.normalize()
-            for obj in [obj1, obj2]:
-                dot_product = obj.velocity.x * normal.x + obj.velocity.y * normal.y
-                reflected_velocity = Vector2D(
-                    obj.velocity.x - 2 * dot_product * normal.x,
-                    obj.velocity.y - 2 * dot_product * normal.y
-                )
-                obj.velocity = reflected_velocity
-            separation = normal * 2
-            obj1.position = obj1.position + separation
-            obj2.position = obj2.position - separation
-        except Exception as e:
-            print(f"Error bouncing off mobile object: {e}")
+    def _swept_aabbs(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Bounces only flip velocity components, so |vel| bounds the travel on each axis
+        half = self.half_size[:, None]
+        reach = np.abs(self.vel, out=self._scratch_reach)
+        mins = np.subtract(self.pos, half, out=self._scratch_mins)
+        maxs = np.add(self.pos, half, out=self._scratch_maxs)
+        mins -= reach
+        maxs += reach
+        return mins, maxs
     
-    def _enforce_boundaries(self):
-        try:
-            for obj in self.objects:
-                if obj.is_static:
-                    continue
-                half_size = obj.size // 2
-                if obj.position.x - half_size < 0:
-                    obj.position.x = half_size
-                    obj.velocity.x = abs(obj.velocity.x)
-                elif obj.position.x + half_size > self.grid_size:
-                    obj.position.x = self.grid_size - half_size
-                    obj.velocity.x = -abs(obj.velocity.x)
-                if obj.position.y - half_size < 0:
-                    obj.position.y = half_size
-                    obj.velocity.y = abs(obj.velocity.y)
-                elif obj.position.y + half_size > self.grid_size:
-                    obj.position.y = self.grid_size - half_size
-                    obj.velocity.y = -abs(obj.velocity.y)
-        except Exception as e:
-            print(f"Error enforcing boundaries: {e}")
+    def find_collision_pairs(self) -> np.ndarray:
+        if self._broad_phase is None:
+            return self.collision_pairs
+        mins, maxs = self._swept_aabbs()
+        return self._broad_phase.candidate_pairs(mins, maxs, self.is_static)
+    
+    def columns(self, *names: str) -> Tuple[np.ndarray, ...]:
+        views = {
+            "type": self.obj_type,
+            "static": self.is_static,
+            "x": self.pos[:, 0],
+            "y": self.pos[:, 1],
+            "vx": self.vel[:, 0],
+            "vy": self.vel[:, 1],
+            "size": self.sizes
+        }
+        return tuple(views[name] for name in names)
     
     def get_state(self) -> Dict:
         try:
-            state = {
+            columns = zip(self.obj_type.tolist(), self.pos.tolist(), self.vel.tolist(),
+                          self.sizes.tolist(), self.colors, self.is_static.tolist())
+            return {
                 "time_step": self.time_step,
                 "grid_size": self.grid_size,
                 "error_count": self.error_count,
-                "objects": []
+                "objects": [
+                    {
+                        "type": _TYPE_NAMES[type_id],
+                        "position": {"x": px, "y": py},
+                        "velocity": {"x": vx, "y": vy},
+                        "size": size,
+                        "color": color,
+                        "is_static": is_static
+                    }
+                    for type_id, (px, py), (vx, vy), size, color, is_static in columns
+                ]
             }
-            for obj in self.objects:
-                obj_state = {
-                    "type": obj.obj_type.value,
-                    "position": {"x": obj.position.x, "y": obj.position.y},
-                    "velocity": {"x": obj.velocity.x, "y": obj.velocity.y},
-                    "size": obj.size,
-                    "color": obj.color,
-                    "is_static": obj.is_static
-                }
-                state["objects"].append(obj_state)
-            return state
         except Exception as e:
             print(f"Error getting state: {e}")
             return {"error": str(e), "time_step": self.time_step}
     
+    def _state_dict(self) -> Dict:
+        return {
+            "time_step": self.time_step,
+            "grid_size": self.grid_size,
+            "error_count": self.error_count,
+            "type_names": _TYPE_NAMES,
+            "columns": {
+                "type_id": self.obj_type,
+                "pos_x": np.ascontiguousarray(self.pos[:, 0]),
+                "pos_y": np.ascontiguousarray(self.pos[:, 1]),
+                "vel_x": np.ascontiguousarray(self.vel[:, 0]),
+                "vel_y": np.ascontiguousarray(self.vel[:, 1]),
+                "size": self.sizes,
+                "color": self.colors,
+                "is_static": self.is_static
+            }
+        }
+    
     def save_state_to_file(self, filename: str):
         try:
-            state = self.get_state()
-            with open(filename, 'w') as f:
-                json.dump(state, f, indent=2)
+            with open(filename, 'wb') as f:
+                if filename.endswith('.npz'):
+                    np.savez(f, time_step=self.time_step, grid_size=self.grid_size, error_count=self.error_count,
+                             type_names=np.array(_TYPE_NAMES), type_id=self.obj_type, pos=self.pos, vel=self.vel,
+                             size=self.sizes, color=np.array(self.colors, dtype=np.uint8).reshape(-1, 3),
+                             is_static=self.is_static)
+                else:
+                    f.write(orjson.dumps(self._state_dict(), option=orjson.OPT_SERIALIZE_NUMPY))
             print(f"State saved to {filename}")
         except Exception as e:
             print(f"Error saving state to {filename}: {e}")
+    
+    def load_state_from_file(self, filename: str):
+        try:
+            if filename.endswith('.npz'):
+                with np.load(filename) as data:
+                    state = {name: data[name] for name in data.files}
+                columns = state
+                pos, vel = state["pos"].tolist(), state["vel"].tolist()
+            else:
+                with open(filename, 'rb') as f:
+                    state = orjson.loads(f.read())
+                columns = state["columns"]
+                pos = np.column_stack((columns["pos_x"], columns["pos_y"])).tolist()
+                vel = np.column_stack((columns["vel_x"], columns["vel_y"])).tolist()
+            type_names = np.asarray(state["type_names"]).tolist()
+            types = [ObjectType(type_names[type_id]) for type_id in np.asarray(columns["type_id"]).tolist()]
+            specs = [(obj_type, Vector2D(*p), Vector2D(*v), size, tuple(color), is_static)
+                     for obj_type, p, v, size, color, is_static in
+                     zip(types, pos, vel, np.asarray(columns["size"]).tolist(), np.asarray(columns["color"]).tolist(),
+                         np.asarray(columns["is_static"]).tolist())]
+            self.grid_size = int(state["grid_size"])
+            self.load_objects(specs)
+            self.time_step = int(state["time_step"])
+            self.error_count = int(state["error_count"])
+            print(f"State loaded from {filename}")
+        except Exception as e:
+            print(f"Error loading state from {filename}: {e}")
+            traceback.print_exc()
+            raise
 
 class SimulationController:
     def __init__(self, grid_size: int = 1000, display_scale: float = 0.5):
         try:
             self.physics_engine = PhysicsEngine(grid_size)
-            self.display_scale = display_scale
+            self.display_scale = float(display_scale)
             self.display_size = int(grid_size * display_scale)
             pygame.init()
             self.screen = pygame.display.set_mode((self.display_size, self.display_size))
             pygame.display.set_caption("Causal AI Simulation")
+            pygame.event.set_blocked(None)
+            pygame.event.set_allowed([pygame.QUIT, pygame.KEYDOWN, pygame.VIDEOEXPOSE])
             self.clock = pygame.time.Clock()
+            self._font = pygame.font.Font(None, 36)
+            self._status_surfs = {
+                paused: self._font.render(f"Status: {'PAUSED' if paused else 'RUNNING'}", True, (255, 255, 255))
+                for paused in (False, True)
+            }
+            self._controls_surf = self._font.render("Space: Pause/Resume | R: Restart | S: Save State | ESC: Exit", True, (255, 255, 255))
+            self._controls_rect = self._controls_surf.get_rect(topleft=(10, self.display_size - 40))
         except Exception as e:
             print(f"Error initializing Pygame: {e}")
             raise
@@ -261,6 +714,7 @@ class SimulationController:
         self.render_errors = 0
         self.max_render_errors = 5
         self.physics_engine.initialize_simulation()
+        self._prepare_render_cache()
     
     def start(self):
         try:
@@ -279,6 +733,7 @@ class SimulationController:
     def restart(self):
         try:
             self.physics_engine.initialize_simulation()
+            self._prepare_render_cache()
             self.paused = False
             self.render_errors = 0
             print("Simulation restarted")
@@ -298,6 +753,8 @@ class SimulationController:
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
                         self.running = False
+                    elif event.type == pygame.VIDEOEXPOSE:
+                        self._full_redraw = True
                     elif event.type == pygame.KEYDOWN:
                         if event.key == pygame.K_SPACE:
                             self.pause()
@@ -319,37 +776,70 @@ class SimulationController:
                     break
                 time.sleep(0.1)
     
+    def _prepare_render_cache(self):
+        self._static_bg = pygame.Surface((self.display_size, self.display_size)).convert()
+        self._static_bg.fill((0, 0, 0))
+        for obj in self.physics_engine.static_objs:
+            self._draw_object(self._static_bg, obj)
+        self._mobile_rects: List[Tuple[GameObject, pygame.Rect]] = []
+        for obj in self.physics_engine.mobile_objs:
+            scaled_size = int(obj.size * self.display_scale)
+            self._mobile_rects.append((obj, pygame.Rect(0, 0, scaled_size, scaled_size)))
+        self._prev_dirty: List[pygame.Rect] = []
+        self._full_redraw = True
+    
+    def _draw_object(self, surface: pygame.Surface, obj: GameObject):
+        scaled_pos = (int(obj.position[0] * self.display_scale), int(obj.position[1] * self.display_scale))
+        scaled_size = int(obj.size * self.display_scale)
+        pygame.draw.rect(surface, obj.color,
+                         (scaled_pos[0] - scaled_size//2,
+                          scaled_pos[1] - scaled_size//2,
+                          scaled_size, scaled_size))
+    
     def _render(self):
-        try:
-            self.screen.fill((0, 0, 0))
-            for obj in self.physics_engine.objects:
-                scaled_pos = (int(obj.position.x * self.display_scale), int(obj.position.y * self.display_scale))
-                scaled_size = int(obj.size * self.display_scale)
-                pygame.draw.rect(self.screen, obj.color,
-                                 (scaled_pos[0] - scaled_size//2,
-                                  scaled_pos[1] - scaled_size//2,
-                                  scaled_size, scaled_size))
-            self._draw_ui()
+        screen = self.screen
+        static_bg = self._static_bg
+        scale = self.display_scale
+        prev_dirty = self._prev_dirty
+        if self._full_redraw:
+            screen.blit(static_bg, (0, 0))
+        else:
+            for rect in prev_dirty:
+                screen.blit(static_bg, rect, rect)
+            # Text is alpha blended, so it must be redrawn over a clean background
+            screen.blit(static_bg, self._controls_rect, self._controls_rect)
+        dirty = []
+        draw_rect = pygame.draw.rect
+        for obj, rect in self._mobile_rects:
+            position = obj.position
+            rect.center = (int(position[0] * scale), int(position[1] * scale))
+            dirty.append(draw_rect(screen, obj.color, rect))
+        dirty.extend(self._draw_ui())
+        update_rects = prev_dirty + dirty
+        dirty_area = sum(rect.w * rect.h for rect in update_rects)
+        if self._full_redraw or dirty_area > DIRTY_RECT_MAX_FRACTION * self.display_size * self.display_size:
             pygame.display.flip()
-        except Exception as e:
-            print(f"Error rendering: {e}")
-            raise
+        else:
+            pygame.display.update(update_rects)
+        self._prev_dirty = dirty
+        self._full_redraw = False
     
-    def _draw_ui(self):
+    def _draw_ui(self) -> List[pygame.Rect]:
+        rects = []
         try:
-            font = pygame.font.Font(None, 36)
-            status = "PAUSED" if self.paused else "RUNNING"
-            status_text = font.render(f"Status: {status}", True, (255, 255, 255))
-            self.screen.blit(status_text, (10, 10))
-            time_text = font.render(f"Step: {self.physics_engine.time_step}", True, (255, 255, 255))
-            self.screen.blit(time_text, (10, 50))
-            if self.physics_engine.error_count > 0:
-                error_text = font.render(f"Errors: {self.physics_engine.error_count}", True, (255, 0, 0))
-                self.screen.blit(error_text, (10, 90))
-            controls_text = font.render("Space: Pause/Resume | R: Restart | S: Save State | ESC: Exit", True, (255, 255, 255))
-            self.screen.blit(controls_text, (10, self.display_size - 40))
+            screen = self.screen
+            font = self._font
+            engine = self.physics_engine
+            rects.append(screen.blit(self._status_surfs[self.paused], (10, 10)))
+            time_text = font.render(f"Step: {engine.time_step}", True, (255, 255, 255))
+            rects.append(screen.blit(time_text, (10, 50)))
+            if engine.error_count > 0:
+                error_text = font.render(f"Errors: {engine.error_count}", True, (255, 0, 0))
+                rects.append(screen.blit(error_text, (10, 90)))
+            screen.blit(self._controls_surf, self._controls_rect)
         except Exception as e:
             print(f"Error drawing UI: {e}")
+        return rects
 
 def main():
     print("Starting Causal AI Simulation...")
@@ -1,5 +1,30 @@
 import json
-from simulation import PhysicsEngine
+import os
+import sys
+import tempfile
+import numpy as np
+from simulation import _sweep_islands, _sweep_pairs, _TYPE_NAMES, PhysicsEngine, ObjectType, Vector2D, SPATIAL_HASH_THRESHOLD, TYPE_WALL, TYPE_CENTER, TYPE_RED, TYPE_BLUE
+
+def brute_force_pairs(engine):
+    reach = np.abs(engine.vel)
+    mins = engine.pos - engine.half_size[:, None] - reach
+    maxs = engine.pos + engine.half_size[:, None] + reach
+    overlap = ~((mins[:, None] > maxs[None]) | (maxs[:, None] < mins[None])).any(axis=2)
+    overlap &= ~(np.tri(len(overlap), dtype=bool) & ~engine.is_static)
+    overlap[engine.is_static] = False
+    return np.argwhere(overlap)
+
+def random_scene(rng, speed=0.0, spaced=False):
+    if spaced:
+        cells = rng.permutation(16 * 16)[:220]
+        centers = np.column_stack((cells % 16, cells // 16)) * 60.0 + 30.0 + rng.uniform(-5, 5, (220, 2))
+    else:
+        centers = rng.uniform(0, 1000, (220, 2))
+    velocities = rng.uniform(-speed, speed, (200, 2))
+    specs = [(ObjectType.CENTER_BLOCK, Vector2D(x, y), Vector2D(0, 0), 50, (0, 255, 0), True) for x, y in centers[:20].tolist()]
+    specs += [(ObjectType.RED_BLOCK, Vector2D(x, y), Vector2D(vx, vy), 30, (255, 0, 0), False)
+              for (x, y), (vx, vy) in zip(centers[20:].tolist(), velocities.tolist())]
+    return specs
 
 def test_physics_engine():
     """Test the physics engine functionality"""
@@ -10,32 +35,31 @@ def test_physics_engine():
     engine.initialize_simulation()
     
     # Test initial state
-    initial_state = engine.get_state()
-    print(f"Initial time step: {initial_state['time_step']}")
-    print(f"Number of objects: {len(initial_state['objects'])}")
+    types, static, vx, vy = engine.columns('type', 'static', 'vx', 'vy')
+    print(f"Initial time step: {engine.time_step}")
+    print(f"Number of objects: {len(types)}")
     
     # Test object types
-    object_types = [obj['type'] for obj in initial_state['objects']]
+    object_types = np.array(_TYPE_NAMES)[types]
     expected_types = ['wall', 'wall', 'wall', 'wall', 'center_block', 'red_block', 'blue_block']
     
-    print(f"Object types: {object_types}")
+    print(f"Object types: {object_types.tolist()}")
     print(f"Expected types: {expected_types}")
+    assert types.tolist() == [TYPE_WALL] * 4 + [TYPE_CENTER, TYPE_RED, TYPE_BLUE]
     
     # Test mobile objects have velocity
-    mobile_objects = [obj for obj in initial_state['objects'] if not obj['is_static']]
-    print(f"Mobile objects: {len(mobile_objects)}")
+    mobile = ~static
+    print(f"Mobile objects: {np.count_nonzero(mobile)}")
     
-    for obj in mobile_objects:
-        velocity = obj['velocity']
-        speed = (velocity['x']**2 + velocity['y']**2)**0.5
-        print(f"{obj['type']} velocity: ({velocity['x']:.3f}, {velocity['y']:.3f}), speed: {speed:.3f}")
+    speeds = np.hypot(vx[mobile], vy[mobile])
+    velocity_line = "%s velocity: (%.3f, %.3f), speed: %.3f\n"
+    sys.stdout.writelines(velocity_line % row for row in zip(object_types[mobile], vx[mobile], vy[mobile], speeds))
     
     # Test simulation update
     print("\nTesting simulation update...")
-    for i in range(10):
-        engine.update()
-        state = engine.get_state()
-        print(f"Step {state['time_step']}: Red block at ({state['objects'][5]['position']['x']:.1f}, {state['objects'][5]['position']['y']:.1f})")
+    traj = engine.run(10, record=[5])
+    step_line = "Step %d: Red block at (%.1f, %.1f)\n"
+    sys.stdout.writelines(step_line % (step, x, y) for step, (x, y) in enumerate(traj[:, 0].tolist(), start=1))
     
     # Test state saving
     engine.save_state_to_file("test_state.json")
@@ -43,5 +67,145 @@ def test_physics_engine():
     
     print("Physics engine test completed successfully!")
 
+def test_spatial_hash_broad_phase():
+    """Test the spatial hash finds the same collision pairs as a brute-force check"""
+    print("Testing spatial hash broad phase...")
+    
+    engine = PhysicsEngine(grid_size=1000)
+    engine.load_objects(random_scene(np.random.default_rng(0)))
+    assert len(engine.objects) >= SPATIAL_HASH_THRESHOLD
+    
+    pairs = engine.find_collision_pairs()
+    expected = brute_force_pairs(engine)
+    
+    print(f"Candidate pairs: {len(pairs)}, brute force pairs: {len(expected)}")
+    assert np.array_equal(pairs, expected)
+    print("Spatial hash test completed successfully!")
+
+def test_quadtree_broad_phase():
+    """Test the quadtree finds the same collision pairs as a brute-force check"""
+    print("Testing quadtree broad phase...")
+    
+    engine = PhysicsEngine(grid_size=1000, broad_phase="quadtree")
+    engine.load_objects(random_scene(np.random.default_rng(1), speed=1.0))
+    
+    pairs = engine.find_collision_pairs()
+    expected = brute_force_pairs(engine)
+    
+    print(f"Candidate pairs: {len(pairs)}, brute force pairs: {len(expected)}")
+    assert np.array_equal(pairs, expected)
+    
+    small = PhysicsEngine(grid_size=1000, seed=4, broad_phase="quadtree")
+    small.initialize_simulation()
+    assert len(small.objects) < SPATIAL_HASH_THRESHOLD
+    assert np.array_equal(small.find_collision_pairs(), brute_force_pairs(small))
+    small.run(200)
+    assert small.error_count == 0
+    print("Quadtree test completed successfully!")
+
+def test_seeded_engines_match():
+    """Test that engines created with the same seed produce the same run"""
+    print("Testing seeded engines...")
+    
+    engines = [PhysicsEngine(grid_size=1000, seed=42) for _ in range(2)]
+    for engine in engines:
+        engine.initialize_simulation()
+        for _ in range(100):
+            engine.update()
+    
+    assert engines[0].get_state() == engines[1].get_state()
+    print("Seeded engine test completed successfully!")
+
+def test_run_matches_update():
+    """Test that batched run() steps match repeated update() calls"""
+    print("Testing batched run...")
+    
+    engines = [PhysicsEngine(grid_size=1000, seed=7) for _ in range(2)]
+    for engine in engines:
+        engine.initialize_simulation()
+    
+    traj = engines[0].run(200, record=[5, 6])
+    for s in range(200):
+        engines[1].update()
+        assert np.array_equal(traj[s], engines[1].pos[[5, 6]])
+    
+    assert engines[0].get_state() == engines[1].get_state()
+    
+    for record in (np.array([0]), np.array([5, 6]), (5, 6)):
+        traj = engines[0].run(3, record=record)
+        assert traj.shape == (3, len(record), 2)
+        assert np.array_equal(traj[-1], engines[0].pos[list(record)])
+    print("Batched run test completed successfully!")
+
+def test_state_file_round_trip():
+    """Test that a saved state file loads back into an identical engine"""
+    print("Testing state file round trip...")
+    
+    engine = PhysicsEngine(grid_size=1000, seed=3)
+    engine.initialize_simulation()
+    engine.run(50)
+    
+    for extension in (".json", ".npz"):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "state" + extension)
+            engine.save_state_to_file(filename)
+            restored = PhysicsEngine()
+            restored.load_state_from_file(filename)
+        
+        assert restored.get_state() == engine.get_state()
+        engine.run(50)
+        restored.run(50)
+        assert restored.get_state() == engine.get_state()
+    print("State file round trip test completed successfully!")
+
+def test_island_sweep_matches_sequential():
+    """Test that solving islands separately matches one sweep over all pairs"""
+    print("Testing island sweep...")
+    
+    specs = random_scene(np.random.default_rng(2), speed=4.0, spaced=True)
+    engines = [PhysicsEngine(grid_size=1000) for _ in range(2)]
+    for engine in engines:
+        engine.load_objects(specs)
+    
+    worst = 0.0
+    for _ in range(20):
+        engines[1].pos[:], engines[1].vel[:] = engines[0].pos, engines[0].vel
+        for sweep, engine in zip((_sweep_islands, _sweep_pairs), engines):
+            sweep(engine.pos, engine.vel, engine.half_size, engine.is_static, engine.static_mins, engine.static_maxs,
+                  engine.mobile_idx, engine.find_collision_pairs(), engine.grid_size)
+        worst = max(worst, np.abs(engines[0].pos - engines[1].pos).max())
+        assert np.array_equal(engines[0].vel, engines[1].vel)
+    
+    print(f"Max position difference: {worst:.2e}")
+    assert worst < 1e-3
+    print("Island sweep test completed successfully!")
+
+def test_dense_scene_has_no_overlaps():
+    """Test that fast blocks in a crowded scene never end a step overlapping"""
+    print("Testing dense scene overlaps...")
+    
+    engine = PhysicsEngine(grid_size=1000)
+    engine.load_objects(random_scene(np.random.default_rng(5), speed=4.0, spaced=True))
+    
+    worst = 0.0
+    for _ in range(300):
+        engine.update()
+        mins = engine.pos - engine.half_size[:, None]
+        maxs = engine.pos + engine.half_size[:, None]
+        depth = (np.minimum(maxs[:, None], maxs[None]) - np.maximum(mins[:, None], mins[None])).min(axis=2)
+        np.fill_diagonal(depth, 0.0)
+        worst = max(worst, depth[~engine.is_static].max())
+    
+    print(f"Deepest overlap: {worst:.4f}")
+    assert worst < 1e-3
+    print("Dense scene test completed successfully!")
+
 if __name__ == "__main__":
-    test_physics_engine() 
\ No newline at end of file
+    test_physics_engine()
+    test_spatial_hash_broad_phase()
+    test_quadtree_broad_phase()
+    test_seeded_engines_match()
+    test_run_matches_update()
+    test_state_file_round_trip()
+    test_island_sweep_matches_sequential()
+    test_dense_scene_has_no_overlaps()
\ No newline at end of file